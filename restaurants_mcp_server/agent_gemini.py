@@ -1,17 +1,18 @@
 # pip install google-adk google-generativeai mcp python-dotenv
+import argparse
 import asyncio
 import os
+import sys
+import threading
 import json
 # Either keep logging if we need it
 import logging
+import logging.handlers
 from dotenv import load_dotenv
-from google.genai import types
+# google.adk and google.genai are imported where used: they are heavy to load,
+# and the API key check at startup doesn't need them
 # Remove genai import if only used for configuration and that's been removed
 # import google.generativeai as genai
-from google.adk.agents.llm_agent import LlmAgent
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,9 +20,20 @@ load_dotenv()
 # Enable debug logging (keep this if you want logging)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Agent events get their own buffered logger: full events are only formatted at DEBUG level,
+# and records reach stdout in batches flushed by flush_events_periodically()
+event_logger = logging.getLogger("events")
+event_logger.propagate = False
+_event_output = logging.StreamHandler(sys.stdout)
+_event_output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+event_handler = logging.handlers.MemoryHandler(capacity=64, flushLevel=logging.ERROR, target=_event_output)
+event_logger.addHandler(event_handler)
+
 # --- Step 1: Get tools from MCP server ---
 async def get_tools_async():
     """Gets tools from the restaurant Search MCP Server."""
+    from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
+
     print("Attempting to connect to MCP restaurant Search server...")
     server_params = StdioServerParameters(
         command="python",
@@ -38,46 +50,74 @@ async def get_tools_async():
 # --- Step 2: Define ADK Agent Creation ---
 async def get_agent_async():
     """Creates an ADK Agent equipped with tools from the MCP Server."""
+    from google.adk.agents.llm_agent import LlmAgent
+
     tools, exit_stack = await get_tools_async()
     print(f"Fetched {len(tools)} tools from MCP server.")
     
     # Create the LlmAgent matching the example structure
-    root_agent = LlmAgent(
-        model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash-preview-04-17"), 
-        name='restaurant_search_assistant',
-        instruction='Help user to search for restaurants using available tools based on prompt.',
-        tools=tools,
-    )
+    try:
+        root_agent = LlmAgent(
+            model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash-preview-04-17"), 
+            name='restaurant_search_assistant',
+            instruction='Help user to search for restaurants using available tools based on prompt.',
+            tools=tools,
+        )
+    except Exception:
+        # Don't leave the MCP server process running without an agent
+        await exit_stack.aclose()
+        raise
     
     return root_agent, exit_stack
 
-# --- Step 3: Main Execution Logic ---
-async def async_main():
+# --- Step 3: Long-lived Agent Setup ---
+# Built once and reused for every query, so the MCP server process (and its caches) stays alive
+APP_NAME = 'restaurant_search_app'
+USER_ID = 'user_restaurants'
+EVENT_FLUSH_INTERVAL = 0.1
+runner = None
+session = None
+exit_stack = None
+
+async def setup():
+    """Starts the MCP server and creates the runner and session shared by all queries."""
+    global runner, session, exit_stack
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
     # Create services
     session_service = InMemorySessionService()
 
     # Create a session
     session = session_service.create_session(
-        state={}, app_name='restaurant_search_app', user_id='user_restaurants'
+        state={}, app_name=APP_NAME, user_id=USER_ID
     )
 
-    # Define the user prompt
-    query = "Find Restaurant from Paris "
-    print(f"User Query: '{query}'")
-    
-    # Format input as types.Content
-    content = types.Content(role='user', parts=[types.Part(text=query)])
-
     # Get agent and exit_stack
     root_agent, exit_stack = await get_agent_async()
 
     # Create Runner
     runner = Runner(
-        app_name='restaurant_search_app',
+        app_name=APP_NAME,
         agent=root_agent,
         session_service=session_service,
     )
 
+async def flush_events_periodically():
+    """Flushes buffered event records every EVENT_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(EVENT_FLUSH_INTERVAL)
+        event_handler.flush()
+
+async def handle_query(query: str):
+    """Runs a single user query through the long-lived runner."""
+    from google.genai import types
+
+    print(f"User Query: '{query}'")
+    
+    # Format input as types.Content
+    content = types.Content(role='user', parts=[types.Part(text=query)])
+
     print("Running agent...")
     events_async = runner.run_async(
         session_id=session.id, 
@@ -85,19 +125,102 @@ async def async_main():
         new_message=content
     )
 
-    async for event in events_async:
-        print(f"Event received: {event}")
+    flusher = asyncio.create_task(flush_events_periodically())
+    try:
+        async for event in events_async:
+            event_logger.debug("Event received: %r", event)
+            if event.is_final_response() and event.content and event.content.parts:
+                event_logger.info("Final response: %s", "".join(part.text or "" for part in event.content.parts))
+            # Yield to the loop so a burst of events can't starve other tasks
+            await asyncio.sleep(0)
+    finally:
+        flusher.cancel()
+        event_handler.flush()
 
-    
-    # Always clean up resources
+async def shutdown():
+    """Closes the MCP server connection opened by setup(), if it got that far."""
+    global exit_stack
+    if exit_stack is None:
+        return
     print("Closing MCP server connection...")
     await exit_stack.aclose()
+    exit_stack = None
     print("Cleanup complete.")
 
-# --- Step 4: Run the Main Function ---
+# Bytes read from stdin past the last returned line
+_stdin_pending = b""
+
+def _read_stdin_line() -> str:
+    """Reads one line from the stdin file descriptor, raising EOFError at end of input.
+    Unlike input(), this holds no lock on sys.stdin, so a thread blocked here can't stall interpreter shutdown.
+    """
+    global _stdin_pending
+    while b"\n" not in _stdin_pending:
+        chunk = os.read(sys.stdin.fileno(), 4096)
+        if not chunk:
+            if not _stdin_pending:
+                raise EOFError
+            break
+        _stdin_pending += chunk
+    line, _, _stdin_pending = _stdin_pending.partition(b"\n")
+    return line.decode(sys.stdin.encoding or "utf-8").rstrip("\r")
+
+async def read_query(prompt: str) -> str:
+    """Reads a query from stdin in a daemon thread, so Ctrl-C at the prompt exits right after shutdown()."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(line, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def read():
+        try:
+            line, error = _read_stdin_line(), None
+        except Exception as e:
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, line, error)
+        except RuntimeError:
+            pass  # The loop already closed, nobody is waiting for this line
+
+    print(prompt, end="", flush=True)
+    threading.Thread(target=read, name="query-reader", daemon=True).start()
+    return await future
+
+# --- Step 4: Main Execution Logic ---
+async def async_main(queries):
+    """Sets up the agent once, then answers the given queries or prompts for them until empty input."""
+    try:
+        await setup()
+        if queries:
+            for query in queries:
+                await handle_query(query)
+            return
+        while True:
+            try:
+                query = await read_query("Query (empty to quit): ")
+            except EOFError:
+                break
+            if not query.strip():
+                break
+            await handle_query(query)
+    finally:
+        # Always clean up resources
+        await shutdown()
+
+# --- Step 5: Run the Main Function ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Restaurant search agent using the Restaurants MCP Server')
+    parser.add_argument('queries', nargs='*', help='Queries to answer; prompts for queries when none are given')
+    args = parser.parse_args()
+
     # Ensure the API key is set
     if not os.getenv("GOOGLE_API_KEY"):
         raise ValueError("GOOGLE_API_KEY environment variable not set.")
-    # Run the main async function
-    asyncio.run(async_main())
+    # Run the main async function with the queries given on the command line, if any
+    asyncio.run(async_main(args.queries))
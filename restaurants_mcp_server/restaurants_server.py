@@ -1,12 +1,18 @@
 import json
+import asyncio
 import httpx
+import orjson
+import jmespath
 import logging
 import signal
 import sys
 import argparse
-from typing import Dict, List, Any, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Any, Optional, Tuple, Union
+from cachetools import TTLCache
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+from restaurants_mcp_server.semantic_cache import SemanticCache
 import os
 
 # Load environment variables
@@ -20,9 +26,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger("restaurants-mcp-server")
 
-# Initialize FastMCP server
-mcp = FastMCP("restaurants")
-
 # Constants
 KEY = os.getenv("KEY")
 HOST = os.getenv("HOST", "booking-com15.p.rapidapi.com")
@@ -32,110 +35,287 @@ if not KEY:
     logger.error("KEY environment variable is not set. Please create a .env file with your API key.")
     sys.exit(1)
 
+# Request base URL, headers and endpoints, built once at import time
+_BASE_URL = f"https://{HOST}"
+_HEADERS = {
+    "X-RapidAPI-Key": KEY,
+    "X-RapidAPI-Host": HOST
+}
+_EP_SEARCH_LOC = "/api/v1/restaurant/searchLocation"
+_EP_SEARCH_REST = "/api/v1/restaurant/searchRestaurants"
+
+# Shared HTTP clients, created lazily so connections are pooled across tool calls.
+# A client is bound to the event loop it was created on, so keep one per loop,
+# together with the async generator that closes it when that loop shuts down.
+_clients: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, AsyncGenerator[None, None]]] = {}
+_limits = httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30)
+
+async def _close_on_loop_stop(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> AsyncGenerator[None, None]:
+    """Stay suspended until the loop finalizes its async generators (asyncio.run does), then close the client."""
+    try:
+        yield
+    finally:
+        _clients.pop(loop, None)
+        await client.aclose()
+
+async def get_client() -> httpx.AsyncClient:
+    """Return the RapidAPI client of the running event loop, creating it if needed."""
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(loop)
+    if entry is not None:
+        return entry[0]
+
+    # Forget clients of loops that were closed without finalizing their async generators
+    for closed_loop in [other for other in _clients if other.is_closed()]:
+        del _clients[closed_loop]
+
+    client = httpx.AsyncClient(
+        base_url=_BASE_URL,
+        headers=_HEADERS,
+        timeout=30.0,
+        limits=_limits,
+        http2=True,
+    )
+    closer = _close_on_loop_stop(loop, client)
+    await closer.__anext__()
+    _clients[loop] = (client, closer)
+    return client
+
+async def close_client() -> None:
+    """Close the RapidAPI client of the running event loop, if any."""
+    entry = _clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
+
+def disable_pooling() -> None:
+    """Stop keeping connections alive, e.g. for tests that use a new event loop per case.
+    Only affects clients created after the call.
+    """
+    global _limits
+    _limits = httpx.Limits(max_keepalive_connections=0)
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Start loading the semantic cache model, and release pooled connections when the MCP server shuts down."""
+    _semantic_cache.start_loading()
+    try:
+        yield
+    finally:
+        logger.info("Closing RapidAPI HTTP client...")
+        await close_client()
+
+# Initialize FastMCP server
+mcp = FastMCP("restaurants", lifespan=server_lifespan)
+
 async def call_rapidapi_request(endpoint: str, params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
     """Make a request to the RapidAPI with proper error handling."""
-    url = f"https://{HOST}{endpoint}"
-    
-    headers = {
-        "X-RapidAPI-Key": KEY,
-        "X-RapidAPI-Host": HOST
-    }
-    
-    logger.info(f"Calling API request to {endpoint} with params: {params}")
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, params=params, timeout=30.0)
-            response.raise_for_status()
-            logger.info(f"API request to {endpoint} successful")
-            return response.json()
-        except Exception as e:
-            logger.error(f"API request to {endpoint} failed: {str(e)}")
-            return {"error": str(e)}
-
-@mcp.tool()
+    logger.info("Calling API request to %s with params: %s", endpoint, params)
+    try:
+        client = await get_client()
+        response = await client.get(endpoint, params=params)
+        response.raise_for_status()
+        logger.debug("API request to %s successful", endpoint)
+        return orjson.loads(response.content)
+    except Exception as e:
+        logger.error("API request to %s failed: %s", endpoint, e)
+        return {"error": str(e)}
+
+# Tool output cache, only for informational (side-effect free) search endpoints
+CACHEABLE_ENDPOINT_PREFIX = "/api/v1/restaurant/search"
+_tool_cache: TTLCache = TTLCache(maxsize=512, ttl=600)
+
+def _cache_key(endpoint: str, params: Optional[Dict[str, str]]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Build a cache key, normalizing params so "Paris" and "paris ", or 187147 and "187147", share an entry."""
+    normalized = (
+        (name, str(value).strip().lower())
+        for name, value in (params or {}).items()
+    )
+    return endpoint, tuple(sorted(normalized))
+
+# Requests in flight, so concurrent identical calls share a single API request
+_inflight: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], "asyncio.Task[Dict[str, Any]]"] = {}
+
+def _finish_request(key: Tuple[str, Tuple[Tuple[str, str], ...]], task: "asyncio.Task[Dict[str, Any]]") -> None:
+    """Stop sharing a finished request and cache its result."""
+    _inflight.pop(key, None)
+    # Never cache failures, the next call should retry the API
+    if not task.cancelled() and task.exception() is None and "error" not in task.result():
+        _tool_cache[key] = task.result()
+
+async def cached_rapidapi_request(endpoint: str, params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Make a RapidAPI request, serving repeated search calls from the tool cache."""
+    if not endpoint.startswith(CACHEABLE_ENDPOINT_PREFIX):
+        return await call_rapidapi_request(endpoint, params)
+
+    key = _cache_key(endpoint, params)
+    cached = _tool_cache.get(key)
+    if cached is not None:
+        logger.info("Cache hit for %s with params: %s", endpoint, params)
+        return cached
+
+    task = _inflight.get(key)
+    if task is not None:
+        logger.info("Joining in-flight request to %s with params: %s", endpoint, params)
+    else:
+        task = asyncio.create_task(call_rapidapi_request(endpoint, params))
+        task.add_done_callback(lambda done: _finish_request(key, done))
+        _inflight[key] = task
+    # Shielded so a cancelled caller doesn't cancel the request for the others
+    return await asyncio.shield(task)
+
+# Semantic cache for location searches, consulted before the exact tool cache
+_semantic_cache = SemanticCache(threshold=0.95, maxsize=1000, ttl=_tool_cache.ttl)
+
+async def search_locations_request(query: str) -> Dict[str, Any]:
+    """Search locations, reusing the result of a semantically similar earlier query when possible."""
+    embedding = await _semantic_cache.embed(query)
+    if embedding is not None:
+        result = _semantic_cache.lookup(embedding)
+        if result is not None:
+            logger.info("Semantic cache hit for query: %s", query)
+            return result
+
+    result = await cached_rapidapi_request(_EP_SEARCH_LOC, {"query": query})
+    if embedding is not None and "error" not in result:
+        _semantic_cache.add(embedding, result)
+    return result
+
+# Fields of the records each tool returns, as (record key, API field)
+LOCATION_FIELDS = (
+    ("name", "localizedName"),
+    ("locationId", "locationId"),
+    ("latitude", "latitude"),
+    ("longitude", "longitude"),
+    ("placeType", "placeType"),
+)
+RESTAURANT_FIELDS = (
+    ("name", "name"),
+    ("averageRating", "averageRating"),
+    ("userReviewCount", "userReviewCount"),
+    ("menuUrl", "menuUrl"),
+    ("city", "parentGeoName"),
+    ("status", "currentOpenStatusCategory"),
+    ("isPremium", "isPremium"),
+)
+
+def compile_record_builder(fields: Tuple[Tuple[str, str], ...]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Generate a function building a record from an API row, with the field names inlined.
+    The fields are fixed at startup, so each row is built by a single dict display
+    instead of a loop over the fields table.
+    """
+    entries = ", ".join(f"{key!r}: get({field!r})" for key, field in fields)
+    source = f"def build_record(row):\n    get = row.get\n    return {{{entries}}}\n"
+    namespace: Dict[str, Any] = {}
+    exec(source, namespace)
+    return namespace["build_record"]
+
+_location_record = compile_record_builder(LOCATION_FIELDS)
+_restaurant_record = compile_record_builder(RESTAURANT_FIELDS)
+
+# Compiled selections of the API rows each tool reports
+_LOC_ROWS = jmespath.compile("data[*]")
+_REST_ROWS = jmespath.compile("data.data[:10]")  # Let set the limit to 10 restaurants
+_TOP_LOC_ID = jmespath.compile("data[0].locationId")
+
+def dump_json(value: Any) -> str:
+    """Encode tool records as one compact JSON string."""
+    return orjson.dumps(value).decode()
+
+# structured_output=False: FastMCP would otherwise repeat the result as structuredContent
+@mcp.tool(structured_output=False)
 async def search_locations(query: str) -> str:
     """Search for restaurant locations by name.
     
     Args:
         query: The location to search for example: "Paris", Las Vegas"
     """
-    logger.info(f"Searching for locations with query: {query}")
-    endpoint = "/api/v1/restaurant/searchLocation"
-    params = {"query": query}
-    
-    result = await call_rapidapi_request(endpoint, params)
+    logger.info("Searching for locations with query: %s", query)
+    result = await search_locations_request(query)
     
     if "error" in result:
-        logger.error(f"Error in search_locations: {result['error']}")
+        logger.error("Error in search_locations: %s", result["error"])
         return f"Error fetching locations: {result['error']}"
     
-    # results
-    results = []
+    rows = _LOC_ROWS.search(result)
+    if rows is not None:
+        logger.debug("Found %d locations for query: %s", len(rows), query)
+        locations = [_location_record(row) for row in rows]
+        return dump_json(locations) if locations else "No locations found matching your query."
+    else:
+        logger.warning("Unexpected response format from API for query: %s", query)
+        return "Unexpected response format from the API."
+
+def restaurants_response(result: Dict[str, Any], location_id: str) -> Union[List[Dict[str, Any]], str]:
+    """Turn a searchRestaurants API result into the restaurants returned to the LLM."""
+    if "error" in result:
+        logger.error("Error in get_restaurants: %s", result["error"])
+        return f"Error fetching restaurants: {result['error']}"
     
-    if "data" in result and isinstance(result["data"], list):
-        locations_count = len(result["data"])
-        logger.info(f"Found {locations_count} locations for query: {query}")
-        for location in result["data"]:
-            location_info = (
-                f"Name: {location.get('localizedName', 'Unknown')}\n"
-                f"Location Id: {location.get('locationId', 'Unknown')}\n"
-                f"Coordinates: {location.get('latitude', 'N/A')}, {location.get('longitude', 'N/A')}\n"
-                f"PlaceType: {location.get('placeType', 'Unknown')}\n"
-            )
-            results.append(location_info)
-        
-        return "\n---\n".join(results) if results else "No locations found matching your query."
+    rows = _REST_ROWS.search(result)
+    if rows is not None:
+        logger.debug("Found %d restaurants for location: %s", len(rows), location_id)
+        return [_restaurant_record(row) for row in rows] or "No Restaurants found for this location and dates."
     else:
-        logger.warning(f"Unexpected response format from API for query: {query}")
+        logger.warning("Unexpected response format from API for location: %s", location_id)
         return "Unexpected response format from the API."
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
 async def get_restaurants(location_id: str) -> str:
     """Get restaurants for a specific location.
     Args:
         location_id: The location ID from the call search_location
     """
-    logger.info(f"Getting restaurants for location_id: {location_id}")
-    endpoint = "/api/v1/restaurant/searchRestaurants"
+    logger.info("Getting restaurants for location_id: %s", location_id)
     params = {
         "locationId": location_id,
 
     }
 
-    result = await call_rapidapi_request(endpoint, params)
-    
-    if "error" in result:
-        logger.error(f"Error in get_restaurants: {result['error']}")
-        return f"Error fetching restaurants: {result['error']}"
-    
-    # Format the response
-    results = []
-    
-    if "data" in result and "data" in result["data"] and isinstance(result["data"]["data"], list):
-        restaurants_count = len(result["data"]["data"])
-        logger.info(f"Found {restaurants_count} restaurants for location: {location_id}")
-        restaurants = result["data"]["data"]
-        for restaurant in restaurants[:10]:  # Let set the limit to 10 restaurants
-            restaurant_info = (
-                f"Name: {restaurant.get('name', 'Unknown')}\n"
-                f"Average Rating: {restaurant.get('averageRating', 'Unknown')}\n"
-                f"User Review Count: {restaurant.get('userReviewCount', 'Unknown')}\n"
-                f"Menu Url: {restaurant.get('menuUrl', 'Unknown')}\n"
-                f"City Name GeoName: {restaurant.get('parentGeoName', 'Unknown')}\n"
-                #f"Award Info: {restaurant.get('year', 'N/A')}, {restaurant.get('awardType', 'N/A')}\n"
-                #f"Has Menu: {restaurant.get('hasMenu', 'Unknown')}\n"
-                f"Status: {restaurant.get('currentOpenStatusCategory', 'Unknown')}\n"
-                f"Premium: {restaurant.get('isPremium', 'Unknown')}\n"
-                #f"priceTag: {restaurant.get('priceTag', 'Unknown')}\n"
-                )
-            # Add room information
-            restaurant_info += f"Room: {restaurant_info}\n"
-            results.append(restaurant_info)
-        
-        return "\n---\n".join(results) if results else "No Restaurants found for this location and dates."
-    else:
-        logger.warning(f"Unexpected response format from API for location: {location_id}")
-        return "Unexpected response format from the API."
+    result = await cached_rapidapi_request(_EP_SEARCH_REST, params)
+    restaurants = restaurants_response(result, location_id)
+    return restaurants if isinstance(restaurants, str) else dump_json(restaurants)
+
+@mcp.tool(structured_output=False)
+async def search_restaurants_batch(queries: List[str]) -> str:
+    """Get restaurants for several locations at once.
+    Each location is searched concurrently and the restaurants of its top match are fetched concurrently.
+    Args:
+        queries: The locations to search for example: ["Paris", "Rome"]
+    """
+    queries = list(dict.fromkeys(queries))
+    logger.info("Searching restaurants for queries: %s", queries)
+
+    location_results = await asyncio.gather(
+        *(search_locations_request(query) for query in queries),
+        return_exceptions=True,
+    )
+
+    # Keep the top location of each query, or the reason there is none
+    responses: Dict[str, Union[List[Dict[str, Any]], str]] = {}
+    location_ids: Dict[str, Any] = {}
+    for query, result in zip(queries, location_results):
+        if isinstance(result, BaseException):
+            responses[query] = f"Error fetching locations: {result}"
+        elif "error" in result:
+            responses[query] = f"Error fetching locations: {result['error']}"
+        elif (location_id := _TOP_LOC_ID.search(result)) is not None:
+            location_ids[query] = str(location_id)
+        else:
+            responses[query] = "No locations found matching your query."
+
+    restaurant_results = await asyncio.gather(
+        *(cached_rapidapi_request(_EP_SEARCH_REST, {"locationId": location_id})
+          for location_id in location_ids.values()),
+        return_exceptions=True,
+    )
+
+    for (query, location_id), result in zip(location_ids.items(), restaurant_results):
+        if isinstance(result, BaseException):
+            responses[query] = f"Error fetching restaurants: {result}"
+        else:
+            responses[query] = restaurants_response(result, location_id)
+
+    return dump_json({query: responses[query] for query in queries})
 
 def handle_shutdown(signum, frame):
     """Handle shutdown signals gracefully."""
@@ -158,7 +338,7 @@ def main():
         mcp.run(transport='stdio')
         return 0
     except Exception as e:
-        logger.error(f"Error starting server: {str(e)}")
+        logger.error("Error starting server: %s", e)
         return 1
     finally:
         logger.info("Restaurants MCP Server shutting down...")
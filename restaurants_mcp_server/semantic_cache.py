@@ -0,0 +1,92 @@
+"""
+Semantic cache for location searches.
+
+Near-duplicate queries ("Paris", "paris", "paris france") miss the exact-match
+tool cache, so this cache compares normalized sentence embeddings of the
+queries and reuses the result of a close enough earlier query. It needs the
+optional fastembed package and stays disabled without it. The model is loaded
+in the background by start_loading(), and queries skip the cache until then.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, List, Optional
+
+try:
+    import numpy as np
+    from fastembed import TextEmbedding
+except ImportError:
+    np = None
+    TextEmbedding = None
+
+logger = logging.getLogger("restaurants-mcp-server")
+
+class SemanticCache:
+    """Cache results by query embedding, matching on cosine similarity."""
+
+    def __init__(self, model_name: str = "BAAI/bge-small-en-v1.5", threshold: float = 0.95, maxsize: int = 1000,
+                 ttl: float = 600):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = TextEmbedding is not None
+        self._model = None
+        self._model_lock = threading.Lock()
+        # Ring buffer of unit-length embeddings, the results they map to and when they were added
+        self._embeddings = None
+        self._values: List[Any] = [None] * maxsize
+        self._added = np.zeros(maxsize) if np is not None else None
+        self._size = 0
+        self._next = 0
+
+    def load(self) -> None:
+        """Load the embedding model once; a failed load disables the cache for every caller."""
+        with self._model_lock:
+            if self._model is not None or not self.enabled:
+                return
+            try:
+                self._model = TextEmbedding(self.model_name)
+            except Exception as e:
+                logger.warning("Disabling semantic cache, loading %s failed: %s", self.model_name, e)
+                self.enabled = False
+
+    def start_loading(self) -> None:
+        """Load the model in a background thread, so no request waits on the download."""
+        if self.enabled:
+            threading.Thread(target=self.load, name="semantic-cache-loader", daemon=True).start()
+
+    def _embed(self, query: str) -> "np.ndarray":
+        vector = next(iter(self._model.embed([query.strip().lower()])))
+        return vector / np.linalg.norm(vector)
+
+    async def embed(self, query: str) -> Optional["np.ndarray"]:
+        """Embed the query off the event loop, or return None while the model isn't loaded."""
+        if not self.enabled or self._model is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._embed, query)
+        except Exception as e:
+            logger.warning("Disabling semantic cache, embedding failed: %s", e)
+            self.enabled = False
+            return None
+
+    def lookup(self, embedding: "np.ndarray") -> Optional[Any]:
+        """Return the result of the most similar unexpired cached query above the threshold."""
+        if not self._size:
+            return None
+        scores = self._embeddings[:self._size] @ embedding
+        scores[self._added[:self._size] < time.monotonic() - self.ttl] = -np.inf
+        best = int(scores.argmax())
+        return self._values[best] if scores[best] >= self.threshold else None
+
+    def add(self, embedding: "np.ndarray", value: Any) -> None:
+        """Cache a result, evicting the oldest entry once full."""
+        if self._embeddings is None:
+            self._embeddings = np.empty((self.maxsize, embedding.shape[0]), dtype=embedding.dtype)
+        self._embeddings[self._next] = embedding
+        self._values[self._next] = value
+        self._added[self._next] = time.monotonic()
+        self._size = min(self._size + 1, self.maxsize)
+        self._next = (self._next + 1) % self.maxsize